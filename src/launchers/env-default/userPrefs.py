@@ -1,28 +1,34 @@
+import maya.mel
 from maya import cmds
 
-cmds.optionVar(intValue=("showHomeScreenOnStartup", 0))
-cmds.optionVar(intValue=("viewCubeShowCube", 0))
-cmds.optionVar(intValue=("SafeModeUserSetupHashOption", 0))
-cmds.whatsNewHighlight(highlightOn=False, showStartupDialog=False)
-
-cmds.undoInfo(state=True, infinity=True)
-cmds.optionVar(intValue=("undoIsInfinite", 1))
-
-# Disable the Save UI layout from scene
-cmds.optionVar(intValue=("useSaveScenePanelConfig", 0))
-# Disable the Load UI layout from scene
-cmds.optionVar(intValue=("useScenePanelConfig", 0))
+OPTION_VARS_INT = {
+    "showHomeScreenOnStartup": 0,
+    "viewCubeShowCube": 0,
+    "SafeModeUserSetupHashOption": 0,
+    "undoIsInfinite": 1,
+    # Disable the Save UI layout from scene
+    "useSaveScenePanelConfig": 0,
+    # Disable the Load UI layout from scene
+    "useScenePanelConfig": 0,
+    # "isIncrementalSaveEnabled": 1,
+    # "RecentBackupsMaxSize": 10,
+    "RecentFilesMaxSize": 10,
+    "RecentProjectsMaxSize": 10,
+    # default framerange
+    "playbackMaxDefault": 1200,
+    "playbackMaxRangeDefault": 1120,
+    "playbackMinDefault": 1001,
+    "playbackMinRangeDefault": 1001,
+}
 
-# cmds.optionVar(intValue=("isIncrementalSaveEnabled", 1))
-# cmds.optionVar(intValue=("RecentBackupsMaxSize", 10 ))
+# set all the optionVars with a single MEL command instead of one call per variable
+maya.mel.eval(
+    "optionVar "
+    + " ".join(f'-intValue "{name}" {value}' for name, value in OPTION_VARS_INT.items())
+    + ";"
+)
 
-cmds.optionVar(intValue=("RecentFilesMaxSize", 10))
-cmds.optionVar(intValue=("RecentProjectsMaxSize", 10))
-
-# default framerange
-cmds.optionVar(intValue=("playbackMaxDefault", 1200))
-cmds.optionVar(intValue=("playbackMaxRangeDefault", 1120))
-cmds.optionVar(intValue=("playbackMinDefault", 1001))
-cmds.optionVar(intValue=("playbackMinRangeDefault", 1001))
+cmds.whatsNewHighlight(highlightOn=False, showStartupDialog=False)
+cmds.undoInfo(state=True, infinity=True)
 
 # TODO find a way to disable copy/pasting
@@ -29,6 +29,7 @@ class FileBatcher:
         arg_maya_file = "REFREPATH_ARG_MAYA_FILE"
         arg_search = "REFREPATH_ARG_SEARCH"
         arg_replace = "REFREPATH_ARG_REPLACE"
+        arg_check_exists = "REFREPATH_ARG_CHECK_EXISTS"
 
     def __init__(
         self,
@@ -83,6 +84,7 @@ class FileBatcher:
         env[self.Variables.arg_maya_file] = str(self.maya_file)
         env[self.Variables.arg_search] = str(self.search)
         env[self.Variables.arg_replace] = str(self.replace)
+        env[self.Variables.arg_check_exists] = str(int(c.REPATH_CHECK_EXISTS))
 
         # python
         refrepath_package = Path(refrepath.__path__[0]).parent
@@ -224,9 +226,6 @@ def batch_directory(
             True to make sure backup file generated by previosu refrepath runs ar enot processed
     """
 
-    def is_not_backup(mfile: Path) -> bool:
-        return not is_backup_file(mfile)
-
     logger.debug(
         f"Started with:\n"
         f"    maya_files_dir={maya_files_dir}\n"
@@ -239,7 +238,9 @@ def batch_directory(
     maya_file_list = get_maya_files_recursively(maya_files_dir)
     if ignore_backups:
         prev_lens = len(maya_file_list)
-        maya_file_list = list(filter(is_not_backup, maya_file_list))
+        maya_file_list = [
+            maya_file for maya_file in maya_file_list if not is_backup_file(maya_file)
+        ]
         logger.debug(f"Removed {prev_lens - len(maya_file_list)} backup files.")
 
     logger.info(f"About to process {len(maya_file_list)} files.")
@@ -282,6 +283,7 @@ def process_session():
     source_maya_file = os.getenv(FileBatcher.Variables.arg_maya_file)
     source_search = os.getenv(FileBatcher.Variables.arg_search)
     source_replace = os.getenv(FileBatcher.Variables.arg_replace)
+    source_check_exists = os.getenv(FileBatcher.Variables.arg_check_exists, "1")
 
     if not source_maya_file or not source_search or not source_replace:
         raise EnvironmentError("Missing one of the REFREPATH_ARG... variable.")
@@ -290,11 +292,12 @@ def process_session():
         maya_file_path=Path(source_maya_file),
         search=source_search,
         replace=Path(source_replace),
+        check_exists=bool(int(source_check_exists)),
     )
 
     # only save the scene if we actually edited at least one reference
     any_reference_edited = any(
-        [repathed_ref.was_updated() for repathed_ref in repathed_references]
+        repathed_ref.was_updated() for repathed_ref in repathed_references
     )
     if any_reference_edited:
         refrepath.maya_utils.save_scene_and_backup()
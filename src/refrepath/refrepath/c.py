@@ -58,3 +58,21 @@ PATH_BACKUP_SUFFIX: str = ".refrepathbackup"
 """
 string to use as suffix on file path for backups
 """
+
+CACHE_DIRECTORY_ENTRIES: bool = True
+"""
+True to cache the content of directories when checking if a path exists.
+Disable for long-running sessions where the disk content might change.
+"""
+
+REPATH_CHECK_EXISTS: bool = True
+"""
+True to check the new references paths exist on disk before editing the scene.
+False saves a disk query per reference, but a missing path is then only detected
+when maya fails to load it, which might leave the reference pointing to it.
+"""
+
+REPATH_MAX_WORKERS: int = 16
+"""
+Maximum number of threads used to compute and check the new references paths.
+"""
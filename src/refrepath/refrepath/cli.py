@@ -115,6 +115,15 @@ def cli():
         type=str,
         default=c.PATH_BACKUP_SUFFIX,
     )
+    parser.add_argument(
+        "--skip_exists_check",
+        action="store_true",
+        help=(
+            "Do not check the new references paths exist before editing the scene. "
+            "Faster on network storage but a missing path is only detected when Maya "
+            "fails to load it."
+        ),
+    )
     parser.add_argument(
         "--ignore_backups",
         action="store_true",
@@ -132,6 +141,9 @@ def cli():
     if parsed.zfill is not None:
         c.PATH_ZFILL = parsed.zfill
 
+    if parsed.skip_exists_check:
+        c.REPATH_CHECK_EXISTS = False
+
     maya_file_dir = Path(parsed.maya_file_dir)
     if not maya_file_dir.exists():
         raise FileNotFoundError(
@@ -1,34 +1,99 @@
+import dataclasses
+import functools
 import logging
+import os
 import re
 from pathlib import Path
 from typing import Optional
+from typing import Union
 
 from maya import cmds
+from maya.api import OpenMaya
+
+from . import c
+from .utils import clear_directory_entries_cache
+from .utils import get_paths_existence
+from .utils import is_path_existing
 
 logger = logging.getLogger(__name__)
 
+_REFERENCE_PATH_QUERY_KWARGS = {"filename": True, "withoutCopyNumber": True}
+"""
+Flags for ``cmds.referenceQuery`` to retrieve a reference file path.
+"""
+
+_INVALID_REFERENCE_NAME = re.compile("sharedReferenceNode|_UNKNOWN_REF_NODE_")
+"""
+Reference nodes whose name contains a match are ignored.
+"""
+
+_LITERAL_BODY = r"(?:[^.^$*+?{}\[\]\\|()]|\\[^A-Za-z0-9])*"
+_LITERAL_PATTERN = re.compile(rf"\(({_LITERAL_BODY})\)|({_LITERAL_BODY})")
+"""
+Match regex patterns that are only made of literal characters, optionally in a group.
+"""
+
 
 def get_references() -> list[str]:
     """
     Retrieve all the references nodes from scene.
     """
+    return [
+        ref_name
+        for ref_name in cmds.ls(type="reference", long=True)
+        if not _INVALID_REFERENCE_NAME.search(ref_name)
+    ]
 
-    def is_ref_valid(ref_name: str):
-        return (
-            "sharedReferenceNode" not in ref_name
-            and "_UNKNOWN_REF_NODE_" not in ref_name
-        )
 
-    scene_reference_list = cmds.ls(type="reference", long=True)
-    scene_reference_list = list(filter(is_ref_valid, scene_reference_list))
-    return scene_reference_list
+@functools.lru_cache(maxsize=128)
+def _compile_search(search: Union[str, re.Pattern]) -> re.Pattern:
+    """
+    Cached ``re.compile`` so the same search is only compiled once per session.
+    """
+    return re.compile(search)
+
+
+@functools.lru_cache(maxsize=None)
+def _get_search_literal(search: re.Pattern) -> Optional[str]:
+    """
+    Returns:
+        the literal string the given pattern matches if it doesn't use any special
+        regex syntax or flags, else None.
+    """
+    # flags like IGNORECASE or VERBOSE change how the characters are matched
+    if search.flags != re.UNICODE:
+        return None
+
+    literal_match = _LITERAL_PATTERN.fullmatch(search.pattern)
+    if not literal_match:
+        return None
 
+    literal = literal_match.group(1)
+    if literal is None:
+        literal = literal_match.group(2)
+    return re.sub(r"\\(.)", r"\1", literal)
 
+
+@dataclasses.dataclass(frozen=True)
 class RepathedReference:
-    def __init__(self, node_name: str, previous_path: Path, new_path: Path):
-        self.node_name: str = node_name
-        self.previous_path: Path = previous_path
-        self.new_path: Path = new_path
+    """
+    Result of the repathing of a single reference node.
+    """
+
+    # dataclass(slots=True) requires python 3.10
+    __slots__ = ("node_name", "previous_path", "new_path")
+
+    node_name: str
+    previous_path: Path
+    new_path: Path
+
+    # frozen forbids the setattr used by default to restore slots (pickle, copy)
+    def __getstate__(self) -> tuple:
+        return tuple(getattr(self, name) for name in self.__slots__)
+
+    def __setstate__(self, state: tuple):
+        for name, value in zip(self.__slots__, state):
+            object.__setattr__(self, name, value)
 
     def was_updated(self) -> bool:
         """
@@ -37,74 +102,216 @@ class RepathedReference:
         return not self.previous_path == self.new_path
 
 
-def repath_reference(
-    node_name,
-    search: str,
-    replace: Path,
-) -> Optional[RepathedReference]:
+def get_reference_path(node_name: str) -> str:
     """
-    Given the reference node name, edit its path to an existing one, so it can be loaded.
-
     Args:
-        node_name: existing maya node name
-        search: part of the path to replace. A regex patterns.
-        replace: partial part to swap with the result of the search
+        node_name: existing maya reference node name
 
     Returns:
-        result of the repathing as RepathedReference instance
+        file path of the given reference node, without copy number.
 
     Raises:
         ValueError: cannot retrieve reference file path
-        FileNotFoundError: new path computed doesn't exist on disk
     """
     # some references don't have filepath and might raise here
-    current_path = cmds.referenceQuery(
-        node_name,
-        filename=True,
-        withoutCopyNumber=True,
-    )
+    current_path = cmds.referenceQuery(node_name, **_REFERENCE_PATH_QUERY_KWARGS)
 
     if not current_path:
         raise ValueError(f"Cannot retrieve reference file path on {node_name}")
 
-    current_path = Path(current_path)
-    logger.info(f"current_path={current_path}")
+    return current_path
+
+
+def get_references_path(node_names: list[str]) -> dict[str, str]:
+    """
+    Query the file path of all the given reference nodes.
+
+    Use the maya API instead of ``cmds.referenceQuery`` to avoid going through a MEL
+    command for each node. There is still one API query per node.
+
+    Args:
+        node_names: existing maya reference node names
+
+    Returns:
+        file path without copy number for each reference node name. Empty string if
+        the path cannot be retrieved.
+    """
+    path_by_node = {}
+    selection = OpenMaya.MSelectionList()
+
+    for node_name in node_names:
+        selection.clear()
+        try:
+            selection.add(node_name)
+            reference = OpenMaya.MFnReference(selection.getDependNode(0))
+            # resolvedName, includePath, includeCopyNumber
+            path_by_node[node_name] = reference.fileName(True, True, False)
+        except Exception as excp:
+            logger.debug("%s: %s", node_name, excp)
+            path_by_node[node_name] = ""
+
+    return path_by_node
+
+
+def compute_new_path(
+    node_name: str,
+    current_path: str,
+    search: Union[str, re.Pattern],
+    replace: str,
+    check_exists: bool = True,
+    replace_prefix: Optional[str] = None,
+) -> RepathedReference:
+    """
+    Compute the new path of the given reference without editing the scene.
+
+    Doesn't call any maya command so it can safely be executed in a separate thread.
+
+    A current path not matched by the search but already inside the replace directory
+    is considered up-to-date, like one whose new path is identical.
+
+    Args:
+        node_name: existing maya node name
+        current_path: file path the reference is currently pointing to
+        search: part of the path to replace. A regex pattern, compiled or not.
+        replace: partial path to swap with the result of the search, as str
+        check_exists:
+            True to check the new path exists on disk. Else it is only checked if maya
+            fails to load it, see ``apply_repath``.
+        replace_prefix:
+            case-normalized replace path ending with a separator, computed from
+            replace if not provided.
 
-    search_pattern = re.compile(search)
-    actual_search = search_pattern.match(str(current_path))
-    if not actual_search:
+    Returns:
+        result of the repathing as RepathedReference instance
+
+    Raises:
+        ValueError: search pattern doesn't match the current path
+        FileNotFoundError: check_exists is True and new path doesn't exist on disk
+    """
+    # match on the normalized path (native separators, no duplicated separators)
+    previous_path = Path(current_path)
+    current_path = str(previous_path)
+
+    search = _compile_search(search)
+
+    # most search are a simple prefix, which doesn't need the regex engine
+    search_literal = _get_search_literal(search)
+    if search_literal is not None:
+        search_end = len(search_literal)
+        if not current_path.startswith(search_literal):
+            search_end = None
+    else:
+        actual_search = search.match(current_path)
+        search_end = actual_search.end() if actual_search else None
+
+    if replace_prefix is None:
+        replace_prefix = os.path.normcase(replace).rstrip(os.sep) + os.sep
+
+    if search_end is not None:
+        new_path = replace + current_path[search_end:]
+    # already repathed by a previous run
+    elif os.path.normcase(current_path).startswith(replace_prefix):
+        new_path = current_path
+    else:
         raise ValueError(
-            f"Search pattern doesn't match anything: {search} on {current_path}>"
+            f"Search pattern doesn't match anything: {search.pattern} on {current_path}>"
         )
 
-    actual_search = actual_search.group(0)
-
-    new_path = str(current_path).replace(actual_search, str(replace))
-    new_path = Path(new_path)
+    # nothing to edit, skip the disk check
+    if new_path == current_path:
+        return RepathedReference(
+            node_name,
+            previous_path=previous_path,
+            new_path=previous_path,
+        )
 
-    if not new_path.exists():
+    if check_exists and not is_path_existing(new_path):
         raise FileNotFoundError(f"New path computed doesn't exist on disk: {new_path}")
 
-    repathed_reference = RepathedReference(
+    return RepathedReference(
         node_name,
-        previous_path=current_path,
-        new_path=new_path,
+        previous_path=previous_path,
+        new_path=Path(new_path),
     )
 
-    if not repathed_reference.was_updated():
-        logger.info(f"Returning earlier, path is already up-to-date on <{node_name}>")
-        return None
 
-    logger.info(f"new_path={new_path}")
+def apply_repath(repathed_reference: RepathedReference):
+    """
+    Load the reference node from the new path computed.
+
+    Args:
+        repathed_reference: result of the repathing for an existing reference node
+
+    Raises:
+        FileNotFoundError: maya failed to load the new path because it doesn't exist
+
+    Warnings:
+        The new path should have been checked on disk before: if maya fails to load it,
+        the reference node might still be left pointing to it.
+    """
+    node_name = repathed_reference.node_name
+    logger.info("current_path=%s", repathed_reference.previous_path)
+    logger.info("new_path=%s", repathed_reference.new_path)
 
-    logger.info(f"Repathing <{node_name}> ...")
+    logger.info("Repathing <%s> ...", node_name)
     # a reference repath can fail because of unkown node, we usually want to ignore that
     # so that's why we just log the error and still consider the repathing sucessful.
+    new_path = str(repathed_reference.new_path)
     try:
-        cmds.file(str(new_path), loadReference=node_name, loadReferenceDepth="none")
+        cmds.file(new_path, loadReference=node_name, loadReferenceDepth="none")
+    except RuntimeError as excp:
+        # the disk is only checked when maya fails, which is not the common case
+        if not is_path_existing(new_path):
+            raise FileNotFoundError(
+                f"New path computed doesn't exist on disk: {new_path}"
+            ) from excp
+        logger.error("%s", excp)
     except Exception as excp:
-        logger.error(f"{excp}")
+        logger.error("%s", excp)
+
+
+def repath_reference(
+    node_name,
+    search: Union[str, re.Pattern],
+    replace: Path,
+    check_exists: bool = True,
+) -> Optional[RepathedReference]:
+    """
+    Given the reference node name, edit its path to an existing one, so it can be loaded.
+
+    Args:
+        node_name: existing maya node name
+        search: part of the path to replace. A regex pattern, compiled or not.
+        replace: partial part to swap with the result of the search
+        check_exists:
+            True to check the new path exists before editing the scene.
+            See ``apply_repath`` warnings if False.
 
+    Returns:
+        result of the repathing as RepathedReference instance
+
+    Raises:
+        ValueError: cannot retrieve reference file path
+        FileNotFoundError: new path computed doesn't exist on disk
+    """
+    # the disk might have changed since the last call
+    clear_directory_entries_cache()
+
+    current_path = get_reference_path(node_name)
+
+    repathed_reference = compute_new_path(
+        node_name,
+        current_path=current_path,
+        search=search,
+        replace=str(replace),
+        check_exists=check_exists,
+    )
+
+    if not repathed_reference.was_updated():
+        logger.info("Returning earlier, path is already up-to-date on <%s>", node_name)
+        return None
+
+    apply_repath(repathed_reference)
     return repathed_reference
 
 
@@ -112,20 +319,27 @@ def open_and_repath_references(
     maya_file_path: Path,
     search: str,
     replace: Path,
+    check_exists: bool = True,
 ) -> list[RepathedReference]:
     """
     Open the given maya file and repath all the references inside.
 
+    When checked on disk, each distinct parent directory of the new paths is listed
+    once and concurrently, but the scene is always edited from the calling thread.
+
     Args:
         maya_file_path:
         search: part of the path to replace. A regex patterns.
         replace: partial part to swap with the result of the search
+        check_exists:
+            True to check all the new paths exist before editing the scene.
+            See ``apply_repath`` warnings if False.
 
     Returns:
         list of RepathedReference instances.
     """
 
-    logger.info(f"Opening <{maya_file_path}> ...")
+    logger.info("Opening <%s> ...", maya_file_path)
     try:
         # still trigger warning but doesn't load references
         cmds.file(
@@ -136,32 +350,97 @@ def open_and_repath_references(
             prompt=False,
         )
     except Exception as excp:
-        logger.error(f"{excp}")
+        logger.error("%s", excp)
+
+    # the disk might have changed since the last scene processed
+    clear_directory_entries_cache()
 
     scene_reference_list = get_references()
     if not scene_reference_list:
         logger.info("Returned early: no references in scene.")
         return []
 
-    repathed_reference_list = []
+    # compile once, the pattern is the same for every reference
+    search_pattern = _compile_search(search)
+    replace_str = str(replace)
+    replace_prefix = os.path.normcase(replace_str).rstrip(os.sep) + os.sep
+
+    # first pass: compute all the new paths, without editing the scene
+    to_check_list: list[RepathedReference] = []
+    error_list: list[tuple[str, Exception]] = []
+
+    path_by_reference = get_references_path(scene_reference_list)
 
     for index, scene_reference in enumerate(scene_reference_list):
 
         logger.info(
-            f"{index+1}/{len(scene_reference_list)} Repathing {scene_reference} ..."
+            "%s/%s Computing new path for %s ...",
+            index + 1,
+            len(scene_reference_list),
+            scene_reference,
         )
+        current_path = path_by_reference.get(scene_reference)
+        if not current_path:
+            error_list.append(
+                (scene_reference, ValueError("Cannot retrieve reference file path"))
+            )
+            continue
+
         try:
-            repathed_reference = repath_reference(
-                node_name=scene_reference,
-                search=search,
-                replace=replace,
+            # checked on disk below, all at once
+            repathed_reference = compute_new_path(
+                scene_reference,
+                current_path=current_path,
+                search=search_pattern,
+                replace=replace_str,
+                check_exists=False,
+                replace_prefix=replace_prefix,
             )
         except Exception as excp:
-            logger.error(excp)
-            repathed_reference = None
+            error_list.append((scene_reference, excp))
+            continue
+
+        if not repathed_reference.was_updated():
+            logger.info("Skipped, path is already up-to-date on <%s>", scene_reference)
+            continue
 
-        if repathed_reference:
-            repathed_reference_list.append(repathed_reference)
+        to_check_list.append(repathed_reference)
 
-    logger.info(f"Finished.")
+    to_repath_list = to_check_list
+    if check_exists:
+        existence_by_path = get_paths_existence(
+            [str(repathed_ref.new_path) for repathed_ref in to_check_list],
+            max_workers=c.REPATH_MAX_WORKERS,
+        )
+        to_repath_list = []
+        for repathed_reference in to_check_list:
+            new_path = str(repathed_reference.new_path)
+            if existence_by_path[new_path]:
+                to_repath_list.append(repathed_reference)
+                continue
+            error_list.append(
+                (
+                    repathed_reference.node_name,
+                    FileNotFoundError(
+                        f"New path computed doesn't exist on disk: {new_path}"
+                    ),
+                )
+            )
+
+    # second pass: only edit the scene with the valid references
+    repathed_reference_list = []
+    for repathed_reference in to_repath_list:
+        try:
+            apply_repath(repathed_reference)
+        except FileNotFoundError as excp:
+            error_list.append((repathed_reference.node_name, excp))
+            continue
+        repathed_reference_list.append(repathed_reference)
+
+    if error_list:
+        logger.warning("%s references could not be repathed:", len(error_list))
+    for scene_reference, excp in error_list:
+        logger.error("<%s> %s", scene_reference, excp)
+
+    logger.info("Finished.")
     return repathed_reference_list
@@ -1,4 +1,6 @@
+import concurrent.futures
 import enum
+import functools
 import logging
 import os
 import re
@@ -28,12 +30,11 @@ def get_child_files_from_root(
 
     for entry in os.scandir(root_path):
 
-        entry = Path(entry.path)
-
+        # DirEntry caches the file type from the directory listing, avoid a stat call
         if entry.is_dir() and recursive:
             out.extend(
                 get_child_files_from_root(
-                    entry,
+                    Path(entry.path),
                     recursive=True,
                     extensions_filter=extensions_filter,
                 )
@@ -41,14 +42,114 @@ def get_child_files_from_root(
 
         else:
 
-            if extensions_filter and entry.suffix in extensions_filter:
-                out.append(entry)
+            if extensions_filter and os.path.splitext(entry.name)[1] in extensions_filter:
+                out.append(Path(entry.path))
             elif not extensions_filter:
-                out.append(entry)
+                out.append(Path(entry.path))
 
     return out
 
 
+@functools.lru_cache(maxsize=None)
+def _get_directory_entries(directory: str) -> Optional[dict[str, bool]]:
+    """
+    Returns:
+        case-normalized names of all the entries in the given directory, mapped to
+        True if the entry is a symlink. None if the directory cannot be listed.
+
+    Raises:
+        FileNotFoundError: directory doesn't exist, not cached as it might be created later
+    """
+    try:
+        with os.scandir(directory) as entries:
+            return {
+                os.path.normcase(entry.name): entry.is_symlink() for entry in entries
+            }
+    except FileNotFoundError:
+        raise
+    except OSError:
+        return None
+
+
+def clear_directory_entries_cache():
+    """
+    Forget the directories listed by ``is_path_existing``, so disk changes are seen.
+    """
+    _get_directory_entries.cache_clear()
+
+
+def is_path_existing(path: str) -> bool:
+    """
+    Check if the given path exists on disk.
+
+    When ``c.CACHE_DIRECTORY_ENTRIES`` is True, the parent directory is listed once and
+    cached, so multiple paths sharing the same parent only cost a single disk query.
+    Call ``clear_directory_entries_cache()`` if the disk content changed since.
+
+    Else ``os.access`` is used as it is cheaper than a full ``os.stat``.
+
+    Like ``Path.exists()``, symlinks are followed so a broken symlink is considered
+    missing, and the disk case-sensitivity is respected: only regular entries found in
+    the cached listing skip the ``os.access`` check.
+
+    Args:
+        path: absolute file or directory path
+    """
+    if not c.CACHE_DIRECTORY_ENTRIES:
+        return os.access(path, os.F_OK)
+
+    directory, name = os.path.split(path)
+    try:
+        entries = _get_directory_entries(directory)
+    except FileNotFoundError:
+        return False
+    if entries is None:
+        return os.access(path, os.F_OK)
+
+    is_symlink = entries.get(os.path.normcase(name))
+    if is_symlink is False:
+        return True
+    # not listed might still exist on a case-insensitive disk normcase ignores (macOS)
+    return os.access(path, os.F_OK)
+
+
+def _list_directory(directory: str):
+    """
+    Fill the directory entries cache for the given directory, if it exists.
+    """
+    try:
+        _get_directory_entries(directory)
+    except FileNotFoundError:
+        pass
+
+
+def get_paths_existence(paths: list[str], max_workers: int) -> dict[str, bool]:
+    """
+    Check if all the given paths exist on disk.
+
+    With ``c.CACHE_DIRECTORY_ENTRIES``, each distinct parent directory is listed a
+    single time, in parallel, and the paths are then resolved from the cache.
+    Else each path is checked in parallel.
+
+    Args:
+        paths: absolute file or directory paths
+        max_workers: maximum number of threads to query the disk with
+
+    Returns:
+        True if the path exists, for each given path.
+    """
+    with concurrent.futures.ThreadPoolExecutor(max_workers) as executor:
+
+        if not c.CACHE_DIRECTORY_ENTRIES:
+            return dict(zip(paths, executor.map(is_path_existing, paths)))
+
+        directories = {os.path.dirname(path) for path in paths}
+        # one task per directory, so concurrent misses don't list it multiple times
+        list(executor.map(_list_directory, directories))
+
+    return {path: is_path_existing(path) for path in paths}
+
+
 def get_maya_files_recursively(root_path) -> list[Path]:
     """
     Parse the given directopry and all its subdirectories for maya files.